@@ -0,0 +1,399 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Núcleo analítico do Sentinela, independente do Streamlit. As funções de
+# relatório são puras sobre um DataFrame; `consultar` as executa sobre um
+# Dataset e memoiza o resultado por (versão dos dados, relatório, filtro,
+# parâmetros). Resultados vindos do cache são compartilhados: não alterar.
+
+SUFIXOS_NOME = ["JUNIOR", "NETO", "FILHO", "SOBRINHO"]
+SOBRENOMES_COMUNS = [
+    "SILVA",
+    "SANTOS",
+    "OLIVEIRA",
+    "SOUZA",
+    "LIMA",
+    "COSTA",
+    "PEREIRA",
+    "ALVES",
+    "FERREIRA",
+    "RODRIGUES",
+]
+CACHE_MB = int(os.getenv("ANALISE_CACHE_MB", "512"))
+
+
+# ------------------------------------------------------------------------------
+# Carga
+# ------------------------------------------------------------------------------
+def extrair_sobrenomes(nomes):
+    partes = nomes.astype(str).str.strip().str.upper().str.split()
+    ultimo = partes.str[-1]
+    penultimo = partes.str[-2]
+    usar_penultimo = ultimo.isin(SUFIXOS_NOME) & (partes.str.len() > 1)
+    return ultimo.where(~usar_penultimo, penultimo).fillna("DESCONHECIDO")
+
+
+def carregar_historico(engine):
+    try:
+        df = pd.read_sql("SELECT * FROM historico_folha", engine)
+    except Exception:
+        return pd.DataFrame()
+
+    # Competência montada aritmeticamente: meses desde 1970 -> datetime64[M].
+    meses_epoch = (df["ano_referencia"].to_numpy() - 1970) * 12 + (
+        df["mes_referencia"].to_numpy() - 1
+    )
+    df["data_base"] = meses_epoch.astype("datetime64[M]").astype("datetime64[ns]")
+
+    # O mesmo nome se repete em todas as competências: o sobrenome é
+    # calculado uma vez por nome distinto e espalhado pelos códigos.
+    codigos, nomes_unicos = pd.factorize(df["nome"])
+    sobrenomes = extrair_sobrenomes(pd.Series(nomes_unicos)).to_numpy()
+    # Só os códigos válidos indexam: nome nulo vira -1 (e, se todos forem
+    # nulos, não há sobrenome algum para indexar).
+    validos = codigos >= 0
+    sobrenome = np.full(len(df), "DESCONHECIDO", dtype=object)
+    sobrenome[validos] = sobrenomes[codigos[validos]]
+    df["sobrenome"] = sobrenome
+    return df
+
+
+class Dataset:
+    # Handle para os dados de um banco. A versão é barata de consultar e é
+    # reaproveitada por `ttl_versao` segundos; quando muda, a próxima carga
+    # relê o banco e as chaves antigas do cache deixam de ser usadas.
+    def __init__(self, engine, ttl_versao=60):
+        self.engine = engine
+        self.chave = str(engine.url)
+        self.ttl_versao = ttl_versao
+        self._lock = threading.Lock()
+        self._versao = None
+        self._versao_em = None
+        self._df = None
+        self._df_versao = None
+
+    def versao(self):
+        agora = time.monotonic()
+        with self._lock:
+            if self._versao_em is not None and agora - self._versao_em < self.ttl_versao:
+                return self._versao
+        try:
+            with self.engine.connect() as conn:
+                linha = conn.execute(
+                    text(
+                        "SELECT COUNT(*), MAX(data_coleta), "
+                        "MAX(ano_referencia * 100 + mes_referencia) "
+                        "FROM historico_folha"
+                    )
+                ).one()
+            versao = tuple(str(v) for v in linha)
+        except Exception:
+            versao = None
+        with self._lock:
+            self._versao, self._versao_em = versao, agora
+        return versao
+
+    def carregar(self):
+        versao = self.versao()
+        with self._lock:
+            if self._df is not None and self._df_versao == versao:
+                return self._df
+        df = carregar_historico(self.engine)
+        with self._lock:
+            self._df, self._df_versao = df, versao
+        return df
+
+
+# ------------------------------------------------------------------------------
+# Relatórios (funções puras sobre o DataFrame já filtrado)
+# ------------------------------------------------------------------------------
+def filtrar(df, anos=None, inicio=None, fim=None):
+    if anos:
+        return df[df["data_base"].dt.year.isin(anos)]
+    if inicio is not None or fim is not None:
+        mask = pd.Series(True, index=df.index)
+        if inicio is not None:
+            mask &= df["data_base"] >= pd.Timestamp(inicio)
+        if fim is not None:
+            mask &= df["data_base"] <= pd.Timestamp(fim)
+        return df.loc[mask]
+    return df
+
+
+def resumo(df):
+    return {
+        "registros": len(df),
+        "competencias": int(df["data_base"].nunique()),
+        "custo_total": float(df["rendimento_liquido"].sum()),
+        "media_mensal": float(df.groupby("data_base")["rendimento_liquido"].sum().mean()),
+        "pessoas_distintas": int(df["nome"].nunique()),
+    }
+
+
+def evolucao_macro(df):
+    return (
+        df.groupby("data_base")
+        .agg({"rendimento_liquido": "sum", "nome": "nunique"})
+        .reset_index()
+    )
+
+
+def rotatividade(df):
+    datas = sorted(df["data_base"].unique())
+    nomes_por_mes = df.groupby("data_base")["nome"].agg(set)
+    resultados = []
+    for i in range(1, len(datas)):
+        nomes_atual = nomes_por_mes[datas[i]]
+        nomes_anterior = nomes_por_mes[datas[i - 1]]
+        resultados.append(
+            {
+                "data_base": datas[i],
+                "Admissões": len(nomes_atual - nomes_anterior),
+                "Desligamentos": -len(nomes_anterior - nomes_atual),
+            }
+        )
+    return pd.DataFrame(resultados)
+
+
+def progressoes(df, limiar=20.0, piso=5000.0):
+    df_sorted = df.sort_values(["nome", "data_base"])
+    salario_anterior = df_sorted.groupby("nome")["rendimento_liquido"].shift(1)
+    df_sorted = df_sorted.assign(
+        salario_anterior=salario_anterior,
+        delta_perc=(df_sorted["rendimento_liquido"] - salario_anterior)
+        / salario_anterior
+        * 100,
+    )
+    progredidos = df_sorted[
+        (df_sorted["delta_perc"] > limiar) & (df_sorted["rendimento_liquido"] > piso)
+    ].sort_values("delta_perc", ascending=False)
+    return progredidos[
+        [
+            "data_base",
+            "nome",
+            "cargo",
+            "salario_anterior",
+            "rendimento_liquido",
+            "delta_perc",
+        ]
+    ]
+
+
+def sobrenomes_comuns(df, n=15):
+    df_clans = df[~df["sobrenome"].isin(SOBRENOMES_COMUNS)]
+    return (
+        df_clans.groupby("sobrenome")["nome"]
+        .nunique()
+        .sort_values(ascending=False)
+        .head(n)
+    )
+
+
+def ranking_acumulado(df, ocultar_deputados=True, n=15):
+    if ocultar_deputados:
+        df = df[~df["cargo"].str.contains("DEPUTADO", case=False)]
+    soma = df.groupby(["nome", "cargo"])["rendimento_liquido"].sum().reset_index()
+    return soma.nlargest(int(n), "rendimento_liquido")
+
+
+def nomes(df):
+    return sorted(df["nome"].unique())
+
+
+def historico_individual(df, nome):
+    df_pessoa = df[df["nome"] == nome].sort_values("data_base")
+    if df_pessoa.empty:
+        return None
+    total_meses = df["data_base"].nunique()
+    meses_pessoa = df_pessoa["data_base"].nunique()
+    categoria = (
+        "VETERANO"
+        if meses_pessoa >= (total_meses * 0.8)
+        else "NOVATO" if meses_pessoa <= 3 else "REGULAR"
+    )
+    cargo_atual = df_pessoa.iloc[-1]["cargo"]
+    df_media = (
+        df[df["cargo"] == cargo_atual]
+        .groupby("data_base")["rendimento_liquido"]
+        .mean()
+        .reset_index()
+    )
+    df_merged = pd.merge(
+        df_pessoa, df_media, on="data_base", how="left", suffixes=("", "_media")
+    )
+    return {
+        "categoria": categoria,
+        "cargo_atual": cargo_atual,
+        "historico": df_pessoa[
+            [
+                "data_base",
+                "cargo",
+                "rendimento_liquido",
+                "total_creditos",
+                "total_debitos",
+            ]
+        ],
+        "comparativo": df_merged[
+            ["data_base", "rendimento_liquido", "rendimento_liquido_media"]
+        ],
+    }
+
+
+def competencia(valor):
+    # "2024-03" -> Period mensal; texto inválido levanta ValueError.
+    periodo = pd.Period(valor, freq="M")
+    if pd.isna(periodo):
+        raise ValueError(f"competência vazia: {valor!r}")
+    return periodo
+
+
+def folha_da_competencia(df, periodo):
+    return df[df["data_base"].dt.to_period("M") == competencia(periodo)]
+
+
+def _bool(valor):
+    return str(valor).lower() in ("1", "true", "sim")
+
+
+# nome -> (função, tipos dos parâmetros aceitos, parâmetros obrigatórios)
+RELATORIOS = {
+    "resumo": (resumo, {}, ()),
+    "macro": (evolucao_macro, {}, ()),
+    "rotatividade": (rotatividade, {}, ()),
+    "progressoes": (progressoes, {"limiar": float, "piso": float}, ()),
+    "sobrenomes": (sobrenomes_comuns, {"n": int}, ()),
+    "ranking": (ranking_acumulado, {"ocultar_deputados": _bool, "n": int}, ()),
+    "nomes": (nomes, {}, ()),
+    "individual": (historico_individual, {"nome": str}, ("nome",)),
+    "competencia": (folha_da_competencia, {"periodo": competencia}, ("periodo",)),
+}
+
+
+# ------------------------------------------------------------------------------
+# Cache de resultados
+# ------------------------------------------------------------------------------
+def _tamanho(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamanho(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(sys.getsizeof(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    # LRU limitado pelo tamanho estimado dos resultados em memória (e não
+    # pelo número de entradas): um ranking e uma seleção de 5 milhões de
+    # linhas ocupam espaços muito diferentes.
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, calcular):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+        # Calculado fora do lock: consultas diferentes não se bloqueiam.
+        valor = calcular()
+        tamanho = _tamanho(valor)
+        with self._lock:
+            if chave in self._itens or tamanho > self.limite_bytes:
+                return valor
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            while self._bytes > self.limite_bytes:
+                _chave, (_valor, removido) = self._itens.popitem(last=False)
+                self._bytes -= removido
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._itens),
+                "bytes": self._bytes,
+                "limite_bytes": self.limite_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+            }
+
+
+cache = CacheLRU(CACHE_MB * 1024 * 1024)
+
+
+def _chave_filtro(anos, inicio, fim):
+    if anos:
+        return ("anos", tuple(sorted(int(a) for a in anos)))
+    if inicio is not None or fim is not None:
+        return (
+            "intervalo",
+            None if inicio is None else pd.Timestamp(inicio),
+            None if fim is None else pd.Timestamp(fim),
+        )
+    return ("tudo",)
+
+
+def consultar(dataset, relatorio, anos=None, inicio=None, fim=None, **params):
+    # "selecao" (o próprio recorte filtrado) também passa pelo cache, mas não
+    # é um relatório: fica fora de RELATORIOS e, portanto, do endpoint.
+    if relatorio != "selecao":
+        funcao, _tipos, _obrigatorios = RELATORIOS[relatorio]
+    chave = (
+        dataset.chave,
+        dataset.versao(),
+        relatorio,
+        _chave_filtro(anos, inicio, fim),
+        tuple(sorted(params.items())),
+    )
+
+    def calcular():
+        if relatorio == "selecao":
+            return filtrar(dataset.carregar(), anos, inicio, fim)
+        df = consultar(dataset, "selecao", anos=anos, inicio=inicio, fim=fim)
+        return funcao(df, **params)
+
+    return cache.obter(chave, calcular)
+
+
+RELATORIOS_PESADOS = (
+    "resumo",
+    "macro",
+    "rotatividade",
+    "progressoes",
+    "sobrenomes",
+    "ranking",
+)
+
+
+def pre_calcular(dataset, relatorios=RELATORIOS_PESADOS):
+    # Aquece o cache com os relatórios pesados do período completo e de cada
+    # ano, que são as seleções mais comuns no dashboard.
+    df = dataset.carregar()
+    if df.empty:
+        return
+    filtros = [{}] + [
+        {"anos": [int(a)]} for a in sorted(df["data_base"].dt.year.unique())
+    ]
+    for filtro in filtros:
+        for relatorio in relatorios:
+            consultar(dataset, relatorio, **filtro)
@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from sqlalchemy import create_engine
 from datetime import date
-from models import engine
+from models import engine_leitura
+import analise
 
 st.set_page_config(page_title="Sentinela AL 5.0", layout="wide", page_icon="🌵")
 
@@ -39,50 +39,11 @@ def exibir_disclaimer():
         </div>
         """, unsafe_allow_html=True)
 
-@st.cache_data
-def carregar_dados():
-    
-    try:
-        query = "SELECT * FROM historico_folha"
-        df = pd.read_sql(query, engine)
-    except Exception:
-        return pd.DataFrame()
-
-    df["data_base"] = pd.to_datetime(
-        df["ano_referencia"].astype(str)
-        + "-"
-        + df["mes_referencia"].astype(str)
-        + "-01"
-    )
-
-    def extrair_sobrenome(nome):
-        partes = str(nome).strip().upper().split()
-        if not partes:
-            return "DESCONHECIDO"
-        ignorar = ["JUNIOR", "NETO", "FILHO", "SOBRINHO"]
-        if len(partes) > 1 and partes[-1] in ignorar:
-            return partes[-2]
-        return partes[-1]
-
-    df["sobrenome"] = df["nome"].apply(extrair_sobrenome)
-    return df
-
-
-@st.cache_data
-def calcular_rotatividade(df):
-    datas = sorted(df["data_base"].unique())
-    resultados = []
-    for i in range(1, len(datas)):
-        mes_atual = datas[i]
-        mes_anterior = datas[i - 1]
-        nomes_atual = set(df[df["data_base"] == mes_atual]["nome"])
-        nomes_anterior = set(df[df["data_base"] == mes_anterior]["nome"])
-        entraram = len(nomes_atual - nomes_anterior)
-        sairam = len(nomes_anterior - nomes_atual)
-        resultados.append(
-            {"data_base": mes_atual, "Admissões": entraram, "Desligamentos": -sairam}
-        )
-    return pd.DataFrame(resultados)
+@st.cache_resource
+def obter_dataset():
+    # Um handle por processo: o cache de relatórios do módulo analise é
+    # compartilhado entre todas as sessões do Streamlit.
+    return analise.Dataset(engine_leitura)
 
 
 @st.cache_data
@@ -91,7 +52,8 @@ def converter_para_csv(df):
 
 
 # Carrega Dataframe
-df_raw = carregar_dados()
+dataset = obter_dataset()
+df_raw = dataset.carregar()
 
 if df_raw.empty:
     st.error("🚨 Banco de dados vazio! Rode o 'ingestor_turbo.py' primeiro.")
@@ -187,16 +149,11 @@ with st.sidebar.form("filtro_temporal_form"):
 # --- A análise usa o último filtro armazenado em session_state.filtro_aplicado ---
 f = st.session_state.filtro_aplicado
 if f["modo"] == "Seleção Rápida (Por Ano)":
-    if f.get("anos"):
-        df_filtered = df_raw[df_raw["data_base"].dt.year.isin(f["anos"])]
-    else:
-        df_filtered = df_raw.copy()
+    filtro = {"anos": f["anos"]} if f.get("anos") else {}
 else:
     start_date, end_date = f.get("range", (min_date, max_date))
-    mask = (df_raw["data_base"].dt.date >= start_date) & (
-        df_raw["data_base"].dt.date <= end_date
-    )
-    df_filtered = df_raw.loc[mask]
+    filtro = {"inicio": start_date, "fim": end_date}
+df_filtered = analise.consultar(dataset, "selecao", **filtro)
 
 
 # Resumo do Filtro
@@ -236,22 +193,17 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs(
 # ------------------------------------------------------------------------------
 with tab1:
     col1, col2, col3 = st.columns(3)
-    custo_total = df_filtered["rendimento_liquido"].sum()
-    media_mensal = df_filtered.groupby("data_base")["rendimento_liquido"].sum().mean()
+    resumo = analise.consultar(dataset, "resumo", **filtro)
 
-    col1.metric("Custo Total (Seleção)", f"R$ {custo_total/1e6:,.1f} Mi")
-    col2.metric("Média Mensal da Folha", f"R$ {media_mensal/1e6:,.1f} Mi")
-    col3.metric("Total de CPFs Distintos", f"{df_filtered['nome'].nunique()}")
+    col1.metric("Custo Total (Seleção)", f"R$ {resumo['custo_total']/1e6:,.1f} Mi")
+    col2.metric("Média Mensal da Folha", f"R$ {resumo['media_mensal']/1e6:,.1f} Mi")
+    col3.metric("Total de CPFs Distintos", f"{resumo['pessoas_distintas']}")
 
     st.markdown("---")
 
     # 1. Gráfico de Evolução (Eixo Duplo)
     st.subheader("📊 Evolução: Dinheiro vs. Pessoas")
-    df_agrupado = (
-        df_filtered.groupby("data_base")
-        .agg({"rendimento_liquido": "sum", "nome": "nunique"})
-        .reset_index()
-    )
+    df_agrupado = analise.consultar(dataset, "macro", **filtro)
 
     fig_dual = go.Figure()
     fig_dual.add_trace(
@@ -297,7 +249,7 @@ with tab1:
 # ------------------------------------------------------------------------------
 with tab2:
     st.subheader("🔄 Rotatividade (Turnover)")
-    df_turnover = calcular_rotatividade(df_filtered)
+    df_turnover = analise.consultar(dataset, "rotatividade", **filtro)
 
     if not df_turnover.empty:
         fig_turn = go.Figure()
@@ -336,32 +288,12 @@ with tab2:
     c_alert, c_export = st.columns([3, 1])
     c_alert.subheader("🚨 Progressões de Carreira (> 20%)")
 
-    df_sorted = df_filtered.sort_values(["nome", "data_base"])
-    df_sorted["salario_anterior"] = df_sorted.groupby("nome")[
-        "rendimento_liquido"
-    ].shift(1)
-    df_sorted["delta_perc"] = (
-        (df_sorted["rendimento_liquido"] - df_sorted["salario_anterior"])
-        / df_sorted["salario_anterior"]
-    ) * 100
-
-    progredidos = df_sorted[
-        (df_sorted["delta_perc"] > 20) & (df_sorted["rendimento_liquido"] > 5000)
-    ].sort_values("delta_perc", ascending=False)
+    progredidos = analise.consultar(
+        dataset, "progressoes", **filtro, limiar=20.0, piso=5000.0
+    )
 
     if not progredidos.empty:
-        csv_progredidos = converter_para_csv(
-            progredidos[
-                [
-                    "data_base",
-                    "nome",
-                    "cargo",
-                    "salario_anterior",
-                    "rendimento_liquido",
-                    "delta_perc",
-                ]
-            ]
-        )
+        csv_progredidos = converter_para_csv(progredidos)
         c_export.download_button(
             label="⚠️ Baixar Relatório",
             data=csv_progredidos,
@@ -369,16 +301,7 @@ with tab2:
             mime="text/csv",
         )
         st.dataframe(
-            progredidos[
-                [
-                    "data_base",
-                    "nome",
-                    "cargo",
-                    "salario_anterior",
-                    "rendimento_liquido",
-                    "delta_perc",
-                ]
-            ].style.format(
+            progredidos.style.format(
                 {
                     "salario_anterior": "R$ {:.2f}",
                     "rendimento_liquido": "R$ {:.2f}",
@@ -394,25 +317,7 @@ with tab2:
 # ------------------------------------------------------------------------------
 with tab3:
     st.subheader("🏰 Sobrenomes Comuns")
-    ignorar = [
-        "SILVA",
-        "SANTOS",
-        "OLIVEIRA",
-        "SOUZA",
-        "LIMA",
-        "COSTA",
-        "PEREIRA",
-        "ALVES",
-        "FERREIRA",
-        "RODRIGUES",
-    ]
-    df_clans = df_filtered[~df_filtered["sobrenome"].isin(ignorar)]
-    top_clans = (
-        df_clans.groupby("sobrenome")["nome"]
-        .nunique()
-        .sort_values(ascending=False)
-        .head(15)
-    )
+    top_clans = analise.consultar(dataset, "sobrenomes", **filtro, n=15)
     fig_clan = px.bar(top_clans, orientation="h", color_discrete_sequence=["#6610f2"])
     fig_clan.update_layout(yaxis={"categoryorder": "total ascending"})
 
@@ -431,12 +336,11 @@ with tab3:
     n_top = st.number_input(
         "Nomes no ranking:", min_value=1, max_value=100, value=15, step=1
     )
-    df_rank = df_filtered.copy()
-    if ocultar:
-        df_rank = df_rank[~df_rank["cargo"].str.contains("DEPUTADO", case=False)]
-    soma = df_rank.groupby(["nome", "cargo"])["rendimento_liquido"].sum().reset_index()
+    ranking = analise.consultar(
+        dataset, "ranking", **filtro, ocultar_deputados=ocultar, n=int(n_top)
+    )
     fig_rank = px.bar(
-        soma.nlargest(int(n_top), "rendimento_liquido"),
+        ranking,
         x="rendimento_liquido",
         y="nome",
         orientation="h",
@@ -446,7 +350,7 @@ with tab3:
     fig_rank.update_layout(yaxis={"categoryorder": "total ascending"})
     st.plotly_chart(fig_rank, use_container_width=True)
     # Botão de exportação dos dados de ranking acumulado
-    csv_ranking = converter_para_csv(soma.nlargest(int(n_top), "rendimento_liquido"))
+    csv_ranking = converter_para_csv(ranking)
     st.download_button(
         label="📥 Exportar ranking acumulado (CSV)",
         data=csv_ranking,
@@ -459,31 +363,25 @@ with tab3:
 # ------------------------------------------------------------------------------
 with tab4:
     st.subheader("🔍 Investigação Individual")
-    nome_sel = st.selectbox("Buscar Servidor:", [""] + sorted(df_raw["nome"].unique()))
+    nome_sel = st.selectbox(
+        "Buscar Servidor:", [""] + analise.consultar(dataset, "nomes")
+    )
 
     if nome_sel:
-        df_pessoa = df_raw[df_raw["nome"] == nome_sel].sort_values("data_base")
-        total_meses = df_raw["data_base"].nunique()
-        meses_pessoa = df_pessoa["data_base"].nunique()
-
-        badge = (
-            "🔰 VETERANO"
-            if meses_pessoa >= (total_meses * 0.8)
-            else "🆕 NOVATO" if meses_pessoa <= 3 else "🔄 REGULAR"
-        )
+        # Sem filtro: o histórico individual sempre cobre o período inteiro.
+        individual = analise.consultar(dataset, "individual", nome=nome_sel)
+        df_pessoa = individual["historico"]
+        df_merged = individual["comparativo"]
+        cargo_atual = individual["cargo_atual"]
+
+        badge = {
+            "VETERANO": "🔰 VETERANO",
+            "NOVATO": "🆕 NOVATO",
+            "REGULAR": "🔄 REGULAR",
+        }[individual["categoria"]]
         st.markdown(f"### {nome_sel} ({badge})")
 
         # Comparativo
-        cargo_atual = df_pessoa.iloc[-1]["cargo"]
-        df_media = (
-            df_raw[df_raw["cargo"] == cargo_atual]
-            .groupby("data_base")["rendimento_liquido"]
-            .mean()
-            .reset_index()
-        )
-        df_merged = pd.merge(
-            df_pessoa, df_media, on="data_base", how="left", suffixes=("", "_media")
-        )
 
         fig_comp = go.Figure()
         fig_comp.add_trace(
@@ -506,28 +404,10 @@ with tab4:
         st.plotly_chart(fig_comp, use_container_width=True)
 
         st.dataframe(
-            df_pessoa[
-                [
-                    "data_base",
-                    "cargo",
-                    "rendimento_liquido",
-                    "total_creditos",
-                    "total_debitos",
-                ]
-            ].style.format({"rendimento_liquido": "R$ {:.2f}"})
+            df_pessoa.style.format({"rendimento_liquido": "R$ {:.2f}"})
         )
         # Botão de exportação dos dados individuais
-        csv_pessoa = converter_para_csv(
-            df_pessoa[
-                [
-                    "data_base",
-                    "cargo",
-                    "rendimento_liquido",
-                    "total_creditos",
-                    "total_debitos",
-                ]
-            ]
-        )
+        csv_pessoa = converter_para_csv(df_pessoa)
         st.download_button(
             label="📥 Exportar dados do servidor (CSV)",
             data=csv_pessoa,
@@ -543,21 +423,15 @@ with tab5:
 
     if modo_filtro == "Seleção Rápida (Por Ano)":
         if not df_filtered.empty:
-            # Adiciona seletor de mês
-            meses_disponiveis = (
-                df_filtered["data_base"]
-                .dt.to_period("M")
-                .drop_duplicates()
-                .sort_values()
-            )
-            meses_str = [str(m) for m in meses_disponiveis]
+            # Adiciona seletor de mês (competências já agregadas na aba macro)
+            meses_str = [d.strftime("%Y-%m") for d in df_agrupado["data_base"]]
             mes_sel_str = st.selectbox(
                 "Selecione o mês:", options=meses_str, index=len(meses_str) - 1
             )
-            mes_sel = pd.Period(mes_sel_str)
             # Filtra para o mês selecionado
-            mask_mes = df_filtered["data_base"].dt.to_period("M") == mes_sel
-            df_mes = df_filtered[mask_mes]
+            df_mes = analise.consultar(
+                dataset, "competencia", **filtro, periodo=mes_sel_str
+            )
 
             if not df_mes.empty:
                 fig_scatter = px.scatter(
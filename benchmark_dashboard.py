@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from gerador_sintetico import definir_banco
+
+# Benchmark headless do app_k11.py via streamlit.testing. Mede a partida a
+# frio (cache vazio), o tempo de cada rerun disparado por filtros e widgets
+# das abas e o pico de memória do processo. Use com um banco gerado por
+# gerador_sintetico.py para medir em escala.
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_k11.py")
+
+
+def _pico_memoria_mb():
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS.
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _widget(colecao, rotulo):
+    for w in colecao:
+        if w.label == rotulo:
+            return w
+    raise LookupError(f"Widget não encontrado: {rotulo!r}")
+
+
+def _botao_aplicar(at):
+    return _widget(at.button, "Aplicar")
+
+
+def passos(at):
+    # (nome do passo, ação que altera o estado antes do rerun)
+    def todos_os_anos():
+        anos = _widget(at.multiselect, "Selecione os Anos:")
+        anos.set_value(list(anos.options))
+        _botao_aplicar(at).click()
+
+    def ano_mais_recente():
+        anos = _widget(at.multiselect, "Selecione os Anos:")
+        anos.set_value(list(anos.options)[:1])
+        _botao_aplicar(at).click()
+
+    def modo_intervalo():
+        _widget(at.radio, "Método de Seleção:").set_value("Intervalo Preciso (Slider)")
+        _botao_aplicar(at).click()
+
+    def mostrar_deputados():
+        _widget(at.checkbox, "Ocultar Deputados").uncheck()
+
+    def ranking_50():
+        _widget(at.number_input, "Nomes no ranking:").set_value(50)
+
+    def detetive():
+        busca = _widget(at.selectbox, "Buscar Servidor:")
+        busca.set_value(busca.options[len(busca.options) // 2])
+
+    def radar_primeiro_mes():
+        meses = _widget(at.selectbox, "Selecione o mês:")
+        meses.set_value(meses.options[0])
+
+    return [
+        ("rerun_sem_mudanca", lambda: None),
+        ("filtro_todos_os_anos", todos_os_anos),
+        ("filtro_ano_mais_recente", ano_mais_recente),
+        ("aba_grupos_mostrar_deputados", mostrar_deputados),
+        ("aba_grupos_ranking_50", ranking_50),
+        ("aba_detetive_busca", detetive),
+        ("aba_radar_mes", radar_primeiro_mes),
+        # Por último: no modo intervalo o seletor de anos e o radar somem.
+        ("filtro_modo_intervalo", modo_intervalo),
+    ]
+
+
+def executar(timeout):
+    from streamlit.testing.v1 import AppTest
+
+    resultados = {}
+    at = AppTest.from_file(APP, default_timeout=timeout)
+
+    inicio = time.perf_counter()
+    at.run()
+    resultados["partida_a_frio"] = time.perf_counter() - inicio
+    if at.exception:
+        raise RuntimeError(f"App falhou na partida: {at.exception[0].value}")
+    print(f"\tpartida_a_frio: {resultados['partida_a_frio']:.2f}s")
+
+    for nome, acao in passos(at):
+        acao()
+        inicio = time.perf_counter()
+        at.run()
+        resultados[nome] = time.perf_counter() - inicio
+        if at.exception:
+            raise RuntimeError(f"App falhou em {nome}: {at.exception[0].value}")
+        print(f"\t{nome}: {resultados[nome]:.2f}s")
+
+    resultados["pico_memoria_mb"] = _pico_memoria_mb()
+    print(f"\tpico_memoria_mb: {resultados['pico_memoria_mb']:,.0f}")
+    return resultados
+
+
+def comparar(resultados, referencia, tolerancia):
+    regressoes = []
+    for nome, valor in resultados.items():
+        base = referencia.get(nome)
+        if base and valor > base * (1 + tolerancia):
+            regressoes.append(f"{nome}: {base:.2f} -> {valor:.2f}")
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark headless do dashboard.")
+    parser.add_argument("--banco", default="sentinela_sintetico.db",
+                        help="arquivo SQLite a medir")
+    parser.add_argument("--usar-database-url", action="store_true",
+                        help="mede o banco de DATABASE_URL em vez de --banco")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--referencia", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="piora relativa aceita antes de acusar regressão (0.2 = 20%%)")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    definir_banco(parser, args)
+    print(f"Benchmark do dashboard em {'DATABASE_URL' if args.usar_database_url else args.banco}...")
+    resultados = executar(args.timeout)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arq:
+            json.dump(resultados, arq, indent=2)
+
+    if args.referencia:
+        with open(args.referencia, encoding="utf-8") as arq:
+            regressoes = comparar(resultados, json.load(arq), args.tolerancia)
+        if regressoes:
+            print("Regressões detectadas:")
+            for r in regressoes:
+                print(f"\t{r}")
+            sys.exit(1)
+        print("Sem regressões em relação à referência.")
@@ -0,0 +1,247 @@
+import argparse
+import os
+import time
+from datetime import date
+import numpy as np
+
+# Gera uma folha sintética com a mesma forma de historico_folha para medir o
+# dashboard em escala (100 mil a 10 milhões de linhas). O banco de destino é
+# escolhido antes de importar models, que lê DATABASE_URL na importação.
+
+PRIMEIROS_NOMES = [
+    "MARIA", "JOSE", "ANA", "JOAO", "ANTONIO", "FRANCISCO", "CARLOS", "PAULO",
+    "PEDRO", "LUCAS", "LUIZ", "MARCOS", "LUIS", "GABRIEL", "RAFAEL", "DANIEL",
+    "MARCELO", "BRUNO", "EDUARDO", "FELIPE", "RODRIGO", "MANOEL", "JULIANA",
+    "FERNANDA", "PATRICIA", "ALINE", "SANDRA", "CAMILA", "AMANDA", "BRUNA",
+    "JESSICA", "LETICIA", "JULIA", "LUCIANA", "VANESSA", "MARIANA", "GABRIELA",
+    "VERA", "VITORIA", "LARISSA", "CLAUDIA", "BEATRIZ", "RITA", "LUANA",
+    "SONIA", "RENATA", "ELIANE", "JOSEFA", "ADRIANA", "SIMONE", "LUDSON",
+]
+SOBRENOMES = [
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "COSTA", "PEREIRA",
+    "ALVES", "FERREIRA", "RODRIGUES", "CAVALCANTE", "ALBUQUERQUE", "MELO",
+    "TENORIO", "CALHEIROS", "LYRA", "VILELA", "BEZERRA", "TORRES", "WANDERLEY",
+    "GOMES", "BARROS", "MONTEIRO", "NUNES", "ARAUJO", "ROCHA", "CARVALHO",
+    "MOURA", "PADILHA", "QUINTELLA", "ACIOLI", "MALTA", "OMENA", "BRANDAO",
+    "JATOBA", "FARIAS", "MACHADO", "AMORIM", "PINTO", "MEDEIROS", "VASCONCELOS",
+    "LEITE", "NOGUEIRA", "TAVARES", "DUARTE", "MENDONCA", "PEIXOTO", "FIRMINO",
+]
+SUFIXOS = ["JUNIOR", "NETO", "FILHO", "SOBRINHO"]
+
+# Cada pessoa recebe um nome base único (dois prenomes e três sobrenomes):
+# o id passa por uma permutação de 0..COMBINACOES-1 (multiplicação por um
+# primo que não divide COMBINACOES) e é decomposto nas listas. Homônimos
+# vêm só de `taxa_homonimos` em Populacao.admitir.
+PARTES_NOME = (PRIMEIROS_NOMES, PRIMEIROS_NOMES, SOBRENOMES, SOBRENOMES, SOBRENOMES)
+COMBINACOES = int(np.prod([len(lista) for lista in PARTES_NOME]))
+PASSO_PERMUTACAO = 1_000_003
+
+# (cargo, peso na distribuição, salário líquido mediano)
+CARGOS = [
+    ("ASSESSOR PARLAMENTAR", 30.0, 4500),
+    ("ASSESSOR TECNICO", 12.0, 6500),
+    ("ASSISTENTE LEGISLATIVO", 10.0, 3200),
+    ("AUXILIAR LEGISLATIVO", 8.0, 2400),
+    ("SECRETARIO PARLAMENTAR", 6.0, 5200),
+    ("ASSESSOR ESPECIAL", 5.0, 9000),
+    ("TECNICO LEGISLATIVO", 5.0, 7800),
+    ("ANALISTA LEGISLATIVO", 4.0, 11000),
+    ("CHEFE DE GABINETE", 3.0, 14000),
+    ("MOTORISTA", 3.0, 2800),
+    ("AGENTE DE SEGURANCA", 3.0, 3600),
+    ("PROCURADOR", 1.0, 25000),
+    ("DIRETOR", 1.0, 18000),
+    ("CONSULTOR LEGISLATIVO", 1.0, 16000),
+    ("TAQUIGRAFO", 0.5, 9500),
+    ("APOSENTADO", 6.0, 7000),
+    ("PENSIONISTA", 3.0, 5000),
+]
+DEPUTADOS = 27
+SALARIO_DEPUTADO = 25322
+
+
+def _gerar_nomes(rng, ids, deslocamento):
+    if len(ids) and ids[-1] >= COMBINACOES:
+        raise ValueError(f"Mais de {COMBINACOES:,} pessoas: não há nomes únicos.")
+    n = len(ids)
+    codigos = (ids * PASSO_PERMUTACAO + deslocamento) % COMBINACOES
+    nomes = None
+    for lista in PARTES_NOME:
+        codigos, indice = np.divmod(codigos, len(lista))
+        parte = np.asarray(lista)[indice]
+        nomes = parte if nomes is None else np.char.add(np.char.add(nomes, " "), parte)
+    com_sufixo = rng.random(n) < 0.06
+    sufixos = np.char.add(" ", rng.choice(SUFIXOS, n))
+    return np.where(com_sufixo, np.char.add(nomes, sufixos), nomes).astype(object)
+
+
+class Populacao:
+    def __init__(self, rng, tamanho, taxa_homonimos):
+        self.rng = rng
+        self.taxa_homonimos = taxa_homonimos
+        self.proximo_id = 0
+        self.deslocamento = int(rng.integers(COMBINACOES))
+        pesos = np.array([c[1] for c in CARGOS])
+        self.pesos_cargo = pesos / pesos.sum()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.nomes = np.empty(0, dtype=object)
+        self.cargos = np.empty(0, dtype=np.int64)
+        self.salarios = np.empty(0, dtype=np.float64)
+        self.admitir(tamanho - DEPUTADOS)
+        # Deputados entram com cargo fixo fora da distribuição.
+        self._anexar(
+            self._nomes_novos(DEPUTADOS),
+            np.full(DEPUTADOS, -1),
+            np.full(DEPUTADOS, float(SALARIO_DEPUTADO)),
+        )
+
+    def _anexar(self, nomes, cargos, salarios):
+        n = len(nomes)
+        self.ids = np.concatenate(
+            [self.ids, np.arange(self.proximo_id, self.proximo_id + n)]
+        )
+        self.proximo_id += n
+        self.nomes = np.concatenate([self.nomes, nomes])
+        self.cargos = np.concatenate([self.cargos, cargos])
+        self.salarios = np.concatenate([self.salarios, salarios])
+
+    def _nomes_novos(self, n):
+        # Nomes dos próximos n ids, na ordem em que _anexar os atribui.
+        ids = np.arange(self.proximo_id, self.proximo_id + n, dtype=np.int64)
+        return _gerar_nomes(self.rng, ids, self.deslocamento)
+
+    def admitir(self, n):
+        if n <= 0:
+            return
+        rng = self.rng
+        nomes = self._nomes_novos(n)
+        # Homônimos: parte dos admitidos reaproveita o nome de alguém que já
+        # passou pela folha (pessoas distintas com o mesmo nome).
+        if len(self.nomes):
+            repetir = rng.random(n) < self.taxa_homonimos
+            nomes[repetir] = rng.choice(self.nomes, repetir.sum())
+        cargos = rng.choice(len(CARGOS), n, p=self.pesos_cargo)
+        medianas = np.array([c[2] for c in CARGOS], dtype=np.float64)[cargos]
+        salarios = medianas * rng.lognormal(0.0, 0.35, n)
+        self._anexar(nomes, cargos, salarios)
+
+    def avancar_mes(self, taxa_rotatividade, taxa_saltos):
+        rng = self.rng
+        n = len(self.ids)
+        # Deputados não saem no meio da legislatura.
+        sai = (rng.random(n) < taxa_rotatividade) & (self.cargos >= 0)
+        fica = ~sai
+        self.ids = self.ids[fica]
+        self.nomes = self.nomes[fica]
+        self.cargos = self.cargos[fica]
+        self.salarios = self.salarios[fica]
+        # Saltos salariais persistentes (progressões/gratificações).
+        salto = rng.random(len(self.ids)) < taxa_saltos
+        self.salarios[salto] *= rng.uniform(1.2, 2.0, salto.sum())
+        self.admitir(int(sai.sum() * rng.uniform(0.8, 1.2)))
+
+    def folha_do_mes(self, ano, mes):
+        rng = self.rng
+        n = len(self.ids)
+        liquido = np.round(self.salarios * rng.normal(1.0, 0.03, n), 2)
+        debitos = np.round(liquido * rng.uniform(0.15, 0.35, n), 2)
+        nomes_cargo = np.array([c[0] for c in CARGOS] + ["DEPUTADO ESTADUAL"])
+        return [
+            {
+                "nome": nome,
+                "cargo": cargo,
+                "rendimento_liquido": float(liq),
+                "total_creditos": float(liq + deb),
+                "total_debitos": float(deb),
+                "mes_referencia": mes,
+                "ano_referencia": ano,
+                "data_coleta": date(ano, mes, 1),
+                "url_origem": f"sintetico://{ano}{mes:02d}/{pid}",
+            }
+            for pid, nome, cargo, liq, deb in zip(
+                self.ids.tolist(),
+                self.nomes.tolist(),
+                nomes_cargo[self.cargos].tolist(),
+                liquido.tolist(),
+                debitos.tolist(),
+            )
+        ]
+
+
+def definir_banco(parser, args):
+    # --banco vale sobre o ambiente: um DATABASE_URL exportado (o de
+    # produção, por exemplo) só é usado com --usar-database-url explícito.
+    if args.usar_database_url:
+        if not os.environ.get("DATABASE_URL"):
+            parser.error("--usar-database-url exige DATABASE_URL definido.")
+        return
+    if os.environ.get("DATABASE_URL"):
+        print("DATABASE_URL do ambiente ignorado; use --usar-database-url para usá-lo.")
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.banco}"
+
+
+def competencias(ano_inicio, hoje):
+    ano, mes = ano_inicio, 1
+    while (ano, mes) < (hoje.year, hoje.month):
+        yield ano, mes
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def gerar(linhas, ano_inicio=2020, seed=42, taxa_rotatividade=0.03,
+          taxa_saltos=0.01, taxa_homonimos=0.02, lote=50_000):
+    from models import (
+        engine,
+        init_db,
+        garantir_particao,
+        inserir_folha,
+        manutencao_pos_ingestao,
+    )
+
+    init_db()
+    meses = list(competencias(ano_inicio, date.today()))
+    for ano in sorted({a for a, _ in meses}):
+        garantir_particao(ano)
+    tamanho = max(linhas // len(meses), DEPUTADOS + 1)
+    rng = np.random.default_rng(seed)
+    populacao = Populacao(rng, tamanho, taxa_homonimos)
+    print(f"Gerando ~{linhas:,} linhas: {len(meses)} competências x ~{tamanho:,} pessoas...")
+
+    inicio = time.perf_counter()
+    total = 0
+    for ano, mes in meses:
+        registros = populacao.folha_do_mes(ano, mes)
+        with engine.begin() as conn:
+            for i in range(0, len(registros), lote):
+                inserir_folha(conn, ano, registros[i : i + lote])
+        total += len(registros)
+        print(f"\t{mes:02d}/{ano}: {len(registros):,} linhas (total {total:,})", end="\r")
+        populacao.avancar_mes(taxa_rotatividade, taxa_saltos)
+    print(f"\nGerados {total:,} registros em {time.perf_counter() - inicio:.1f}s.")
+    # Deixa os anos fechados compactados, como ficam em produção.
+    manutencao_pos_ingestao({a for a, _ in meses})
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera folha sintética para benchmark.")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--banco", default="sentinela_sintetico.db",
+                        help="arquivo SQLite de destino")
+    parser.add_argument("--usar-database-url", action="store_true",
+                        help="grava no banco de DATABASE_URL em vez de --banco")
+    parser.add_argument("--ano-inicio", type=int, default=2020)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rotatividade", type=float, default=0.03)
+    parser.add_argument("--saltos", type=float, default=0.01)
+    parser.add_argument("--homonimos", type=float, default=0.02)
+    args = parser.parse_args()
+
+    definir_banco(parser, args)
+    gerar(
+        args.linhas,
+        ano_inicio=args.ano_inicio,
+        seed=args.seed,
+        taxa_rotatividade=args.rotatividade,
+        taxa_saltos=args.saltos,
+        taxa_homonimos=args.homonimos,
+    )
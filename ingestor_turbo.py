@@ -1,51 +1,95 @@
 
 import os
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 import pandas as pd
 import time
 import urllib3
 from io import StringIO
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from models import Session, Funcionario, init_db
+import transporte
+from models import (
+    Session,
+    CacheHttp,
+    init_db,
+    garantir_particao,
+    inserir_folha,
+    manutencao_pos_ingestao,
+    tabela_folha,
+)
+from sqlalchemy import select
 from datetime import datetime
 
 BASE_URL = "https://transparencia.al.al.leg.br"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
-session_http = requests.Session()
-session_http.headers.update(HEADERS)
+CHUNK_LISTA = 64 * 1024
 
 
-def get_links_mes(ano, mes):
+def url_lista_mestra(ano, mes):
     codigo_folha = f"{ano}{mes:02d}%7CEM"
-    url = f"{BASE_URL}/?arg=&folha={codigo_folha}"
+    return f"{BASE_URL}/?arg=&folha={codigo_folha}"
+
+
+def _links_lidos(parser):
+    for _evento, elemento in parser.read_events():
+        href = elemento.get("href") or ""
+        nome = "".join(elemento.itertext()).strip()
+        # Descarta o que já foi lido para a árvore não crescer: cada <a> fica
+        # sozinho no seu <td>, então a poda sobe pelos ancestrais e remove as
+        # linhas (<tr>) anteriores, como no idioma clássico do iterparse.
+        elemento.clear(keep_tail=True)
+        for no in (elemento, *elemento.iterancestors()):
+            while no.getprevious() is not None:
+                del no.getparent()[0]
+        if "detalhar.php" in href and len(nome) > 3:
+            full_url = href if href.startswith("http") else f"{BASE_URL}/{href}"
+            yield {"nome": nome, "url": full_url}
+
+
+def iter_links_mes(ano, mes, validadores=None):
+    # Lê a lista mestra em blocos e entrega cada link assim que o parser o
+    # encontra, sem esperar o download/parse do documento inteiro.
+    # Se `validadores` for passado, o GET é condicional e o dicionário é
+    # atualizado com o status e os validadores da nova resposta; "completa"
+    # só fica True se o corpo inteiro foi lido e parseado sem erro.
+    url = url_lista_mestra(ano, mes)
     print(f"Baixando lista mestra: {mes}/{ano}...")
+    encontrados = 0
     try:
-        response = session_http.get(url, timeout=20)
-        if "Nenhum resultado" in response.text:
-            print(f"\tSem dados para {mes}/{ano}.")
-            return []
-        soup = BeautifulSoup(response.content, "html.parser")
-        funcionarios = []
-        for link in soup.find_all("a", href=True):
-            if "detalhar.php" in link["href"] and len(link.text.strip()) > 3:
-                full_url = (
-                    link["href"]
-                    if link["href"].startswith("http")
-                    else f'{BASE_URL}/{link["href"]}'
-                )
-                funcionarios.append({"nome": link.text.strip(), "url": full_url})
-        return funcionarios
-    except Exception as e:
+        with transporte.get(
+            url, validadores=validadores, timeout=20, stream=True
+        ) as response:
+            if validadores is not None:
+                validadores["completa"] = False
+                validadores["status"] = response.status_code
+                if response.status_code == 304:
+                    return
+                validadores.update(transporte.validadores_da_resposta(response))
+            parser = etree.HTMLPullParser(events=("end",), tag="a")
+            for bloco in response.iter_content(chunk_size=CHUNK_LISTA):
+                parser.feed(bloco)
+                for link in _links_lidos(parser):
+                    encontrados += 1
+                    yield link
+            parser.close()
+            for link in _links_lidos(parser):
+                encontrados += 1
+                yield link
+            if validadores is not None:
+                validadores["completa"] = True
+    except requests.RequestException as e:
         print(f"\tErro de conexão na lista: {e}")
-        return []
+        return
+    if not encontrados:
+        print(f"\tSem dados para {mes}/{ano}.")
+
+
+def get_links_mes(ano, mes):
+    return list(iter_links_mes(ano, mes))
 
 
 def processar_funcionario_individual(func_info):
     try:
-        response = session_http.get(func_info["url"], timeout=15)
+        response = transporte.get(func_info["url"], timeout=15)
         if response.status_code != 200:
             return None
         html_io = StringIO(response.text)
@@ -83,41 +127,84 @@ def processar_funcionario_individual(func_info):
     return None
 
 
+def salvar_validadores(db_session, url, validadores):
+    # Lista interrompida no meio (timeout, reset) não pode virar 304 depois.
+    if not validadores.get("completa"):
+        return
+    if not (validadores.get("etag") or validadores.get("last_modified")):
+        return
+    try:
+        db_session.merge(
+            CacheHttp(
+                url=url,
+                etag=validadores.get("etag"),
+                last_modified=validadores.get("last_modified"),
+            )
+        )
+        db_session.commit()
+    except Exception as e:
+        db_session.rollback()
+        print(f"\tErro ao salvar cache HTTP: {e}")
+
+
 def ingestor_turbo(ano_inicio, ano_fim):
+    # Partições antes da sessão: no SQLite o engine de escrita tem uma única
+    # conexão, que a sessão segura durante o loop.
+    for ano in range(ano_fim, ano_inicio - 1, -1):
+        garantir_particao(ano)
     db_session = Session()
     total_global = 0
+    anos_alterados = set()
     for ano in range(ano_fim, ano_inicio - 1, -1):
+        tabela = tabela_folha(ano)
         for mes in range(12, 0, -1):
             if ano == 2025 and mes > 11:
                 continue
-            lista_raw = get_links_mes(ano, mes)
-            if not lista_raw:
-                continue
-            urls_existentes = (
-                db_session.query(Funcionario.url_origem)
-                .filter_by(mes_referencia=mes, ano_referencia=ano)
-                .all()
-            )
-            urls_set = {u[0] for u in urls_existentes}
-            lista_para_baixar = [f for f in lista_raw if f["url"] not in urls_set]
-            total_mes = len(lista_raw)
-            a_baixar = len(lista_para_baixar)
-            if a_baixar == 0:
-                print(
-                    f"\tMês {mes}/{ano} já está completo no banco ({total_mes} registros)."
+            urls_existentes = db_session.execute(
+                select(tabela.c.url_origem).where(
+                    tabela.c.mes_referencia == mes, tabela.c.ano_referencia == ano
                 )
-                continue
-            print(
-                f"Turbinando {mes}/{ano}: Baixando {a_baixar} novos (de {total_mes})..."
+            ).all()
+            urls_set = {u[0] for u in urls_existentes}
+            url_lista = url_lista_mestra(ano, mes)
+            cache = db_session.get(CacheHttp, url_lista)
+            # Sem nenhum registro do mês no banco (ex.: partição apagada com
+            # o cache_http ainda no banco principal), o GET não é condicional.
+            validadores = (
+                {"etag": cache.etag, "last_modified": cache.last_modified}
+                if cache and urls_set
+                else {}
             )
             resultados_para_salvar = []
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                future_to_func = {
-                    executor.submit(processar_funcionario_individual, f): f
-                    for f in lista_para_baixar
-                }
-                completos = 0
-                for future in as_completed(future_to_func):
+            total_mes = 0
+            a_baixar = 0
+            completos = 0
+            with ThreadPoolExecutor(max_workers=transporte.MAX_WORKERS) as executor:
+                futures = []
+                # Os detalhes começam a ser baixados enquanto a lista mestra
+                # ainda está chegando.
+                for f in iter_links_mes(ano, mes, validadores):
+                    total_mes += 1
+                    if f["url"] in urls_set:
+                        continue
+                    urls_set.add(f["url"])
+                    a_baixar += 1
+                    futures.append(executor.submit(processar_funcionario_individual, f))
+                if validadores.get("status") == 304:
+                    print(f"\tMês {mes}/{ano} sem alterações na fonte (304).")
+                    continue
+                if total_mes == 0:
+                    continue
+                if a_baixar == 0:
+                    print(
+                        f"\tMês {mes}/{ano} já está completo no banco ({total_mes} registros)."
+                    )
+                    salvar_validadores(db_session, url_lista, validadores)
+                    continue
+                print(
+                    f"Turbinando {mes}/{ano}: Baixando {a_baixar} novos (de {total_mes})..."
+                )
+                for future in as_completed(futures):
                     dados = future.result()
                     completos += 1
                     print(
@@ -127,29 +214,31 @@ def ingestor_turbo(ano_inicio, ano_fim):
                     if dados:
                         resultados_para_salvar.append(dados)
             print(f"\n\tSalvando {len(resultados_para_salvar)} registros no banco...")
-            for d in resultados_para_salvar:
-                try:
-                    novo = Funcionario(
-                        nome=d["nome"],
-                        cargo=d["cargo"],
-                        rendimento_liquido=d["rendimento_liquido"],
-                        total_creditos=d["total_creditos"],
-                        total_debitos=d["total_debitos"],
-                        mes_referencia=mes,
-                        ano_referencia=ano,
-                        url_origem=d["url_origem"],
-                    )
-                    db_session.add(novo)
-                except Exception as e:
-                    print(f"\tErro ao salvar registro: {e}")
             try:
+                # Grava direto na partição do ano; as demais não são tocadas.
+                inserir_folha(
+                    db_session,
+                    ano,
+                    [
+                        {**d, "mes_referencia": mes, "ano_referencia": ano}
+                        for d in resultados_para_salvar
+                    ],
+                )
                 db_session.commit()
                 total_global += len(resultados_para_salvar)
+                anos_alterados.add(ano)
                 print(f"\tMês {mes}/{ano} finalizado com sucesso!")
+                # Só marca a lista como vista se nenhum detalhe falhou; do
+                # contrário o próximo run precisa recebê-la de novo (200).
+                if len(resultados_para_salvar) == a_baixar:
+                    salvar_validadores(db_session, url_lista, validadores)
             except Exception as e:
                 db_session.rollback()
                 print(f"\tErro ao salvar lote: {e}")
     db_session.close()
+    transporte.resumo_metricas()
+    if total_global:
+        manutencao_pos_ingestao(anos_alterados)
     print(f"\nFim Turbo. Total salvo: {total_global}")
 
 
@@ -1,5 +1,10 @@
 from sqlalchemy import (
     create_engine,
+    event,
+    insert,
+    select,
+    text,
+    MetaData,
     Column,
     Integer,
     String,
@@ -7,29 +12,194 @@ from sqlalchemy import (
     Date,
     UniqueConstraint,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
 from datetime import date
+import glob
 import os
+import re
+import sqlite3
 
 DB_NAME = "sentinela_alagoas.db"
 DATABASE_URL = os.environ.get("DATABASE_URL") or f"sqlite:///{DB_NAME}"
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5 if not DATABASE_URL.startswith("sqlite") else None,
-    max_overflow=10 if not DATABASE_URL.startswith("sqlite") else None,
-    connect_args=(
-        {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-    ),
-)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Perfil de produção do SQLite: WAL permite que o dashboard leia enquanto o
+# ingestor grava; busy_timeout evita o "database is locked" em disputas curtas.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # ~64 MB (valor negativo = KiB)
+    "mmap_size": 268435456,  # 256 MB
+    "busy_timeout": 15000,  # ms
+    "temp_store": "MEMORY",
+}
+
+
+# Pragmas que valem por banco: precisam ser repetidos em cada partição
+# anexada, onde fica historico_folha. Os demais valem para a conexão toda.
+_PRAGMAS_POR_ESQUEMA = ("journal_mode", "synchronous", "cache_size", "mmap_size")
+
+
+def _aplicar_pragmas_esquema(cursor, esquema):
+    for pragma in _PRAGMAS_POR_ESQUEMA:
+        cursor.execute(f"PRAGMA {esquema}.{pragma}={SQLITE_PRAGMAS[pragma]}")
+
+
+def _aplicar_pragmas_sqlite(engine, somente_leitura=False):
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(dbapi_conn, _registro):
+        cursor = dbapi_conn.cursor()
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={valor}")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+# O SQLite anexa no máximo 10 bancos por conexão (SQLITE_MAX_ATTACHED padrão).
+# Quando os arquivos anuais passam disso, os anos fechados mais antigos são
+# agrupados em um único arquivo (ver agrupar_anos_fechados).
+LIMITE_ANEXOS = 10
+
+
+def _arquivo_particao(inicio, fim=None):
+    base, ext = os.path.splitext(_ARQUIVO_BASE)
+    nome = inicio if fim in (None, inicio) else f"{inicio}-{fim}"
+    return f"{base}_{nome}{ext or '.db'}"
+
+
+def _esquema_particao(inicio, fim=None):
+    return f"folha_{inicio}" if fim in (None, inicio) else f"folha_{inicio}_{fim}"
+
+
+def _particoes_em_disco():
+    # (ano inicial, ano final) de cada arquivo: <base>_AAAA.db guarda um ano,
+    # <base>_AAAA-BBBB.db um bloco de anos fechados.
+    base, ext = os.path.splitext(_ARQUIVO_BASE)
+    padrao = re.compile(
+        re.escape(base) + r"_(\d{4})(?:-(\d{4}))?" + re.escape(ext or ".db") + "$"
+    )
+    particoes = []
+    for arquivo in glob.glob(f"{glob.escape(base)}_*{ext or '.db'}"):
+        achou = padrao.match(arquivo)
+        if achou:
+            inicio = int(achou.group(1))
+            particoes.append((inicio, int(achou.group(2) or inicio)))
+    return sorted(particoes)
+
+
+def _particao_do_ano(ano):
+    for inicio, fim in _particoes_em_disco():
+        if inicio <= ano <= fim:
+            return inicio, fim
+    return ano, ano
+
+
+def _sincronizar_particoes_sqlite(dbapi_conn, somente_leitura):
+    # Cada partição vive em um arquivo próprio, anexado como folha_AAAA (ou
+    # folha_AAAA_BBBB). A view temporária historico_folha une as partições
+    # para quem lê a tabela inteira; filtros por ano_referencia descem para o
+    # índice de cada arquivo.
+    particoes = _particoes_em_disco()
+    if len(particoes) > LIMITE_ANEXOS:
+        raise RuntimeError(
+            f"{len(particoes)} partições de {Funcionario.__tablename__} em disco, "
+            f"mas o SQLite anexa no máximo {LIMITE_ANEXOS} bancos por conexão. "
+            "Rode `python models.py --compactar` para agrupar os anos fechados."
+        )
+    esperados = {_esquema_particao(*p): p for p in particoes}
+    cursor = dbapi_conn.cursor()
+    anexados = {
+        linha[1] for linha in cursor.execute("PRAGMA database_list")
+        if linha[1].startswith("folha_")
+    }
+    uniao = " UNION ALL ".join(
+        f"SELECT * FROM {esquema}.{Funcionario.__tablename__}" for esquema in esperados
+    )
+    view = cursor.execute(
+        "SELECT sql FROM temp.sqlite_master WHERE type='view' AND name=?",
+        (Funcionario.__tablename__,),
+    ).fetchone()
+    view_atualizada = view[0].endswith(uniao) if view else not esperados
+    if anexados == set(esperados) and view_atualizada:
+        cursor.close()
+        return
+    if somente_leitura:
+        cursor.execute("PRAGMA query_only=OFF")
+    cursor.execute(f"DROP VIEW IF EXISTS temp.{Funcionario.__tablename__}")
+    # Partições que deixaram de existir (anos agrupados em bloco).
+    for esquema in anexados - set(esperados):
+        cursor.execute(f"DETACH DATABASE {esquema}")
+    for esquema, particao in esperados.items():
+        if esquema in anexados:
+            continue
+        cursor.execute(f"ATTACH DATABASE ? AS {esquema}", (_arquivo_particao(*particao),))
+        _aplicar_pragmas_esquema(cursor, esquema)
+    if esperados:
+        cursor.execute(f"CREATE TEMP VIEW {Funcionario.__tablename__} AS {uniao}")
+    if somente_leitura:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _criar_engine(somente_leitura=False):
+    if not IS_SQLITE:
+        return create_engine(
+            DATABASE_URL, pool_pre_ping=True, pool_size=5, max_overflow=10
+        )
+    # No SQLite só existe um escritor por vez: o engine de escrita fica com
+    # uma única conexão e os leitores ganham um pool próprio.
+    engine = create_engine(
+        DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=5 if somente_leitura else 1,
+        max_overflow=5 if somente_leitura else 0,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        },
+    )
+    _aplicar_pragmas_sqlite(engine, somente_leitura)
+
+    @event.listens_for(engine, "checkout")
+    def _ao_retirar(dbapi_conn, _registro, _proxy):
+        # Na retirada (e não só na conexão) para enxergar anos criados depois
+        # que a conexão entrou no pool.
+        _sincronizar_particoes_sqlite(dbapi_conn, somente_leitura)
+
+    return engine
+
+
+# SQLite: o arquivo principal guarda as tabelas auxiliares e cada ano de
+# historico_folha fica em <arquivo>_AAAA.db (ver _sincronizar_particoes_sqlite).
+# Postgres: historico_folha é particionada por RANGE (ano_referencia).
+_ARQUIVO_BASE = (make_url(DATABASE_URL).database or DB_NAME) if IS_SQLITE else None
+engine = _criar_engine()
+# Banco em memória não é compartilhado entre engines: leitura usa o mesmo.
+if IS_SQLITE and engine.url.database not in (None, "", ":memory:"):
+    engine_leitura = _criar_engine(somente_leitura=True)
+else:
+    engine_leitura = engine
 Session = sessionmaker(bind=engine)
 Base = declarative_base()
 
 
+if IS_SQLITE:
+    _ARGS_FOLHA = (UniqueConstraint("url_origem", name="unico_por_url"),)
+else:
+    # Em tabela particionada, PK e UNIQUE precisam conter a chave de partição.
+    _ARGS_FOLHA = (
+        UniqueConstraint("url_origem", "ano_referencia", name="unico_por_url"),
+        {"postgresql_partition_by": "RANGE (ano_referencia)"},
+    )
+
+
 class Funcionario(Base):
     __tablename__ = "historico_folha"
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     nome = Column(String, index=True)
     cargo = Column(String, index=True)
 
@@ -38,18 +208,369 @@ class Funcionario(Base):
     total_debitos = Column(Float)
 
     mes_referencia = Column(Integer, index=True)
-    ano_referencia = Column(Integer, index=True)
+    ano_referencia = Column(Integer, index=True, primary_key=not IS_SQLITE)
 
     data_coleta = Column(Date, default=date.today)
-    url_origem = Column(String, nullable=False, unique=True)
+    url_origem = Column(String, nullable=False)
+
+    __table_args__ = _ARGS_FOLHA
+
+
+class CacheHttp(Base):
+    # Validadores HTTP das listas mestras já processadas por completo, usados
+    # em GETs condicionais (competência sem mudança volta 304).
+    __tablename__ = "cache_http"
 
-    __table_args__ = (UniqueConstraint("url_origem", name="unico_por_url"),)
+    url = Column(String, primary_key=True)
+    etag = Column(String)
+    last_modified = Column(String)
+    atualizado_em = Column(Date, default=date.today, onupdate=date.today)
+
+
+_metadata_particoes = MetaData()
+
+
+def tabela_folha(ano):
+    # Tabela onde os registros de `ano` são gravados/lidos sem passar pelas
+    # demais partições.
+    if not IS_SQLITE:
+        return Funcionario.__table__
+    esquema = _esquema_particao(*_particao_do_ano(ano))
+    chave = f"{esquema}.{Funcionario.__tablename__}"
+    if chave not in _metadata_particoes.tables:
+        Funcionario.__table__.to_metadata(_metadata_particoes, schema=esquema)
+    return _metadata_particoes.tables[chave]
+
+
+def _conectar_particao(arquivo):
+    # Conexão direta ao arquivo da partição, sem a view temporária
+    # historico_folha que as conexões do pool criam (VACUUM e REINDEX
+    # esbarram nela). Autocommit para que VACUUM rode fora de transação.
+    return sqlite3.connect(
+        arquivo,
+        timeout=SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        isolation_level=None,
+    )
+
+
+def _criar_arquivo_particao(arquivo):
+    avulso = create_engine(f"sqlite:///{arquivo}", poolclass=NullPool)
+    Funcionario.__table__.create(avulso, checkfirst=True)
+    avulso.dispose()
+    con = _conectar_particao(arquivo)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.close()
+
+
+def _mesclar_particoes(grupo):
+    # Copia as partições do grupo para um único arquivo <base>_AAAA-BBBB.db.
+    # O bloco é montado em um arquivo temporário e só entra no lugar depois
+    # que todas as origens foram retiradas de cena; se alguma estiver presa
+    # (no Windows, aberta pelo dashboard), nada muda em disco.
+    inicio, fim = grupo[0][0], grupo[-1][1]
+    destino = _arquivo_particao(inicio, fim)
+    temporario = f"{destino}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    print(f"Agrupando partições {', '.join(_esquema_particao(*p) for p in grupo)} "
+          f"em {os.path.basename(destino)}...")
+    _criar_arquivo_particao(temporario)
+    colunas = ", ".join(
+        c.name for c in Funcionario.__table__.columns if c.name != "id"
+    )
+    con = _conectar_particao(temporario)
+    try:
+        for particao in grupo:
+            con.execute(
+                "ATTACH DATABASE ? AS origem", (_arquivo_particao(*particao),)
+            )
+            con.execute("PRAGMA origem.wal_checkpoint(TRUNCATE)")
+            con.execute(
+                f"INSERT INTO main.{Funcionario.__tablename__} ({colunas}) "
+                f"SELECT {colunas} FROM origem.{Funcionario.__tablename__}"
+            )
+            con.execute("DETACH DATABASE origem")
+        con.execute("ANALYZE")
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except sqlite3.Error:
+        con.close()
+        os.remove(temporario)
+        raise
+    con.close()
+
+    retiradas = []
+    try:
+        for particao in grupo:
+            origem = _arquivo_particao(*particao)
+            os.replace(origem, f"{origem}.mesclado")
+            retiradas.append(origem)
+    except OSError as e:
+        for origem in retiradas:
+            os.replace(f"{origem}.mesclado", origem)
+        os.remove(temporario)
+        raise RuntimeError(
+            f"Não foi possível agrupar as partições (arquivo em uso?): {e}"
+        ) from e
+    os.replace(temporario, destino)
+    for origem in retiradas:
+        for sufixo in (".mesclado", "-wal", "-shm"):
+            try:
+                os.remove(f"{origem}{sufixo}")
+            except OSError:
+                pass
+    # Conexões paradas no pool ainda apontam para as origens: o checkout
+    # seguinte as desanexa e monta a view com o bloco novo.
+    engine.dispose()
+    if engine_leitura is not engine:
+        engine_leitura.dispose()
+
+
+def agrupar_anos_fechados(maximo=LIMITE_ANEXOS):
+    # Mantém no máximo `maximo` arquivos de partição juntando os anos fechados
+    # mais antigos em um bloco. No Postgres não há limite de partições.
+    if not IS_SQLITE:
+        return
+    particoes = _particoes_em_disco()
+    excesso = len(particoes) - maximo
+    if excesso <= 0:
+        return
+    fechadas = [p for p in particoes if p[1] < date.today().year]
+    grupo = fechadas[: excesso + 1]
+    if len(grupo) < 2:
+        raise RuntimeError(
+            f"{len(particoes)} partições e só {len(fechadas)} de anos fechados: "
+            f"não há como ficar em {maximo} arquivos."
+        )
+    _mesclar_particoes(grupo)
+
+
+def garantir_particao(ano):
+    if IS_SQLITE:
+        particao = _particao_do_ano(ano)
+        arquivo = _arquivo_particao(*particao)
+        if not os.path.exists(arquivo):
+            # Abre espaço para o arquivo novo antes de criá-lo.
+            agrupar_anos_fechados(LIMITE_ANEXOS - 1)
+            arquivo = _arquivo_particao(*_particao_do_ano(ano))
+            if not os.path.exists(arquivo):
+                _criar_arquivo_particao(arquivo)
+        # A retirada do pool anexa o arquivo novo e refaz a view.
+        with engine.connect():
+            pass
+    else:
+        with engine.connect() as conn:
+            conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {Funcionario.__tablename__}_{ano} "
+                    f"PARTITION OF {Funcionario.__tablename__} "
+                    f"FOR VALUES FROM ({ano}) TO ({ano + 1})"
+                )
+            )
+            conn.commit()
+
+
+def inserir_folha(conn, ano, registros):
+    if registros:
+        conn.execute(insert(tabela_folha(ano)), registros)
+
+
+def _migrar_tabela_legada():
+    # Bancos criados antes do particionamento têm historico_folha como uma
+    # tabela única: os registros são redistribuídos por ano uma única vez.
+    nome = Funcionario.__tablename__
+    if IS_SQLITE:
+        with engine.connect() as conn:
+            legada = conn.exec_driver_sql(
+                "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name=?",
+                (nome,),
+            ).fetchone()
+            if not legada:
+                return
+            anos = [
+                a for (a,) in conn.exec_driver_sql(
+                    f"SELECT DISTINCT ano_referencia FROM main.{nome} "
+                    "WHERE ano_referencia IS NOT NULL"
+                )
+            ]
+        print(f"Migrando '{nome}' para partições anuais: {sorted(anos)}...")
+        for ano in sorted(anos):
+            garantir_particao(ano)
+        # Sem o id: anos agrupados em bloco compartilham a sequência do arquivo.
+        colunas = ", ".join(
+            c.name for c in Funcionario.__table__.columns if c.name != "id"
+        )
+        with engine.connect() as conn:
+            for ano in anos:
+                esquema = _esquema_particao(*_particao_do_ano(ano))
+                conn.exec_driver_sql(
+                    f"INSERT INTO {esquema}.{nome} ({colunas}) "
+                    f"SELECT {colunas} FROM main.{nome} WHERE ano_referencia = ?",
+                    (ano,),
+                )
+            conn.exec_driver_sql(f"DROP TABLE main.{nome}")
+            conn.commit()
+            conn.exec_driver_sql("VACUUM main")
+    else:
+        with engine.begin() as conn:
+            tipo = conn.execute(
+                text(
+                    "SELECT relkind FROM pg_class "
+                    "WHERE relname = :nome AND pg_table_is_visible(oid)"
+                ),
+                {"nome": nome},
+            ).scalar()
+            if tipo != "r":
+                return
+            print(f"Migrando '{nome}' para tabela particionada por ano...")
+            conn.execute(text(f"ALTER TABLE {nome} RENAME TO {nome}_legado"))
+            # Nomes de índice são globais no schema: libera-os para a nova tabela.
+            indices = conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = :t"),
+                {"t": f"{nome}_legado"},
+            ).scalars().all()
+            for indice in indices:
+                conn.execute(text(f'ALTER INDEX "{indice}" RENAME TO "{indice}_legado"'))
+            Funcionario.__table__.create(conn)
+            anos = conn.execute(
+                text(f"SELECT DISTINCT ano_referencia FROM {nome}_legado")
+            ).scalars().all()
+            for ano in anos:
+                conn.execute(
+                    text(
+                        f"CREATE TABLE {nome}_{ano} PARTITION OF {nome} "
+                        f"FOR VALUES FROM ({ano}) TO ({ano + 1})"
+                    )
+                )
+            colunas = ", ".join(
+                c.name for c in Funcionario.__table__.columns if c.name != "id"
+            )
+            conn.execute(
+                text(
+                    f"INSERT INTO {nome} ({colunas}) "
+                    f"SELECT {colunas} FROM {nome}_legado"
+                )
+            )
+            conn.execute(text(f"DROP TABLE {nome}_legado"))
 
 
 def init_db():
-    Base.metadata.create_all(engine)
+    if IS_SQLITE:
+        # Antes de qualquer conexão do pool, que recusa partições demais.
+        agrupar_anos_fechados()
+        Base.metadata.create_all(engine, tables=[CacheHttp.__table__])
+    else:
+        Base.metadata.create_all(engine)
+    _migrar_tabela_legada()
+    garantir_particao(date.today().year)
     print(f"Banco de dados '{DB_NAME}' pronto (Versão Anti-Homônimos)!")
 
 
+def compactar_ano(ano, snapshot_parquet=False):
+    # Anos fechados não mudam mais: reescreve a partição compacta, reconstrói
+    # os índices e atualiza estatísticas; opcionalmente exporta um snapshot
+    # colunar para leitura rápida.
+    if IS_SQLITE:
+        inicio, fim = _particao_do_ano(ano)
+        rotulo = _esquema_particao(inicio, fim).removeprefix("folha_")
+        con = _conectar_particao(_arquivo_particao(inicio, fim))
+        try:
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            con.execute(f"REINDEX {Funcionario.__tablename__}")
+            con.execute("ANALYZE")
+            con.execute("VACUUM")
+        finally:
+            con.close()
+    else:
+        inicio = fim = ano
+        rotulo = str(ano)
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            conn.execute(
+                text(f"VACUUM (FULL, ANALYZE) {Funcionario.__tablename__}_{ano}")
+            )
+    if snapshot_parquet:
+        import pandas as pd
+
+        destino = f"{os.path.splitext(_ARQUIVO_BASE or DB_NAME)[0]}_{rotulo}.parquet"
+        tabela = tabela_folha(ano)
+        try:
+            pd.read_sql(
+                select(tabela).where(
+                    tabela.c.ano_referencia.between(inicio, fim)
+                ),
+                engine_leitura,
+            ).to_parquet(destino, index=False)
+            print(f"\tSnapshot colunar gravado em {destino}.")
+        except ImportError:
+            print("\tSnapshot colunar ignorado: instale pyarrow para gerar Parquet.")
+    print(f"Partição {rotulo} compactada.")
+
+
+def anos_particionados():
+    if IS_SQLITE:
+        return [inicio for inicio, _fim in _particoes_em_disco()]
+    with engine.connect() as conn:
+        return sorted(
+            int(nome.rsplit("_", 1)[1])
+            for nome in conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent "
+                    "WHERE p.relname = :nome"
+                ),
+                {"nome": Funcionario.__tablename__},
+            ).scalars()
+        )
+
+
+def _anos_por_particao(anos):
+    # Um representante por partição (o último ano dela): no SQLite vários
+    # anos fechados podem dividir o mesmo arquivo e não precisam ser
+    # compactados duas vezes.
+    if not IS_SQLITE:
+        return sorted(set(anos))
+    return sorted({_particao_do_ano(ano)[1] for ano in anos})
+
+
+def compactar_anos_fechados(snapshot_parquet=False):
+    agrupar_anos_fechados(LIMITE_ANEXOS - 1)
+    for ano in _anos_por_particao(anos_particionados()):
+        if ano < date.today().year:
+            compactar_ano(ano, snapshot_parquet)
+
+
+def manutencao_pos_ingestao(anos=()):
+    # Após uma carga: só as partições tocadas são mantidas. Anos fechados são
+    # compactados; o ano corrente só recebe checkpoint do WAL (senão ele só
+    # cresce enquanto houver leitores) e estatísticas novas para o planejador.
+    for ano in _anos_por_particao(anos):
+        if ano < date.today().year:
+            compactar_ano(ano)
+            continue
+        if IS_SQLITE:
+            esquema = _esquema_particao(*_particao_do_ano(ano))
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"PRAGMA {esquema}.wal_checkpoint(TRUNCATE)")
+                conn.exec_driver_sql(f"ANALYZE {esquema}")
+                conn.commit()
+        else:
+            with engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as conn:
+                conn.execute(text(f"ANALYZE {Funcionario.__tablename__}_{ano}"))
+    if IS_SQLITE:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA main.wal_checkpoint(TRUNCATE)")
+            conn.exec_driver_sql("PRAGMA optimize")
+            conn.commit()
+    print("Manutenção pós-ingestão concluída (checkpoint/ANALYZE).")
+
+
 if __name__ == "__main__":
+    import sys
+
     init_db()
+    if "--compactar" in sys.argv:
+        compactar_anos_fechados(snapshot_parquet="--parquet" in sys.argv)
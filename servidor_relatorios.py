@@ -0,0 +1,130 @@
+import argparse
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+import analise
+from models import engine_leitura
+
+# Endpoint JSON local para os relatórios do núcleo analítico. Todos os
+# clientes compartilham o mesmo cache, então um relatório pesado é calculado
+# uma vez por versão dos dados.
+#
+#   GET /relatorios                          -> relatórios e parâmetros (aceitos e obrigatórios)
+#   GET /relatorios/macro?anos=2024,2025
+#   GET /relatorios/ranking?inicio=2024-01-01&fim=2024-06-01&n=30
+#   GET /status                              -> versão dos dados e cache
+
+dataset = analise.Dataset(engine_leitura)
+
+
+def para_json(valor):
+    if isinstance(valor, pd.DataFrame):
+        return json.loads(
+            valor.to_json(orient="records", date_format="iso", force_ascii=False)
+        )
+    if isinstance(valor, pd.Series):
+        return para_json(valor.reset_index())
+    if isinstance(valor, dict):
+        return {k: para_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [para_json(v) for v in valor]
+    # NaN/inf não existem em JSON: viram null (média de seleção vazia, etc.).
+    if isinstance(valor, (float, np.floating)) and not math.isfinite(valor):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def _data(valor):
+    data = pd.Timestamp(valor)
+    if pd.isna(data):
+        raise ValueError(f"data vazia: {valor!r}")
+    return data
+
+
+def _ler_parametros(relatorio, query):
+    _funcao, tipos, obrigatorios = analise.RELATORIOS[relatorio]
+    faltando = [nome for nome in obrigatorios if nome not in query]
+    if faltando:
+        raise ValueError(f"obrigatório: {', '.join(faltando)}")
+    filtro = {}
+    if "anos" in query:
+        filtro["anos"] = [int(a) for a in query["anos"][0].split(",") if a]
+    if "inicio" in query:
+        filtro["inicio"] = _data(query["inicio"][0])
+    if "fim" in query:
+        filtro["fim"] = _data(query["fim"][0])
+    params = {nome: tipo(query[nome][0]) for nome, tipo in tipos.items() if nome in query}
+    return filtro, params
+
+
+class RelatoriosHandler(BaseHTTPRequestHandler):
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        if partes == ["status"]:
+            return self._responder(
+                200,
+                {"versao": dataset.versao(), "cache": analise.cache.estatisticas()},
+            )
+        if partes == ["relatorios"]:
+            return self._responder(
+                200,
+                {
+                    nome: {
+                        "parametros": sorted(["anos", "inicio", "fim", *tipos]),
+                        "obrigatorios": list(obrigatorios),
+                    }
+                    for nome, (_f, tipos, obrigatorios) in analise.RELATORIOS.items()
+                },
+            )
+        if len(partes) != 2 or partes[0] != "relatorios":
+            return self._responder(404, {"erro": "rota não encontrada"})
+        relatorio = partes[1]
+        if relatorio not in analise.RELATORIOS:
+            return self._responder(404, {"erro": f"relatório desconhecido: {relatorio}"})
+        try:
+            filtro, params = _ler_parametros(relatorio, parse_qs(url.query))
+        except (TypeError, ValueError) as e:
+            return self._responder(400, {"erro": f"parâmetro inválido: {e}"})
+        try:
+            resultado = analise.consultar(dataset, relatorio, **filtro, **params)
+        except Exception as e:
+            return self._responder(500, {"erro": str(e)})
+        if resultado is None:
+            # historico_individual de um nome que não está na seleção.
+            return self._responder(404, {"erro": "nenhum registro para os parâmetros"})
+        self._responder(200, {"versao": dataset.versao(), "dados": para_json(resultado)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve relatórios do Sentinela em JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--sem-pre-calculo", action="store_true")
+    args = parser.parse_args()
+
+    if not args.sem_pre_calculo:
+        # Em segundo plano para o servidor já aceitar conexões.
+        threading.Thread(target=analise.pre_calcular, args=(dataset,), daemon=True).start()
+    servidor = ThreadingHTTPServer((args.host, args.porta), RelatoriosHandler)
+    print(f"Servindo relatórios em http://{args.host}:{args.porta}/relatorios ...")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
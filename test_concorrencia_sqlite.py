@@ -0,0 +1,137 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pytest
+
+# Prova de que o dashboard continua lendo durante uma carga grande: uma
+# transação de escrita longa fica aberta pelo engine de escrita enquanto
+# outra thread lê pelo engine_leitura. Sem WAL, as leituras esbarrariam em
+# "database is locked". Roda com `python test_concorrencia_sqlite.py` ou
+# pelo pytest. models lê DATABASE_URL na importação, então o cenário roda em
+# um processo próprio, apontado para um banco temporário.
+
+ANO = 2024
+LINHAS_ESCRITA = 200_000
+SEGURAR_ESCRITA_S = 3.0
+
+
+def _registros(inicio, n):
+    return [
+        {
+            "nome": f"SERVIDOR {i}",
+            "cargo": "ASSESSOR PARLAMENTAR",
+            "rendimento_liquido": 1000.0,
+            "total_creditos": 1200.0,
+            "total_debitos": 200.0,
+            "mes_referencia": 1 + i % 12,
+            "ano_referencia": ANO,
+            "url_origem": f"teste://{ANO}/{i}",
+        }
+        for i in range(inicio, inicio + n)
+    ]
+
+
+def cenario_leituras_durante_escrita_longa():
+    from sqlalchemy import text
+    from models import (
+        Session,
+        engine,
+        engine_leitura,
+        garantir_particao,
+        init_db,
+        inserir_folha,
+    )
+
+    init_db()
+    garantir_particao(ANO)
+    # Linhas já confirmadas, que o leitor deve enxergar durante a carga.
+    with Session() as db:
+        inserir_folha(db, ANO, _registros(0, 1000))
+        db.commit()
+
+    escrita_aberta = threading.Event()
+    erros = []
+    leituras = []
+
+    def escritor():
+        with Session() as db:
+            # BEGIN EXCLUSIVE reproduz o pior momento de uma carga (cache
+            # despejado em disco / commit): em modo rollback-journal isso
+            # bloqueia todos os leitores; em WAL, não.
+            db.connection().exec_driver_sql("BEGIN EXCLUSIVE")
+            inserir_folha(db, ANO, _registros(1000, LINHAS_ESCRITA))
+            escrita_aberta.set()
+            time.sleep(SEGURAR_ESCRITA_S)  # transação segue aberta
+            db.commit()
+
+    thread = threading.Thread(target=escritor)
+    thread.start()
+    assert escrita_aberta.wait(60), "escritor não chegou a abrir a transação"
+    while thread.is_alive():
+        try:
+            with engine_leitura.connect() as conn:
+                total = conn.execute(
+                    text("SELECT COUNT(*) FROM historico_folha")
+                ).scalar()
+            leituras.append(total)
+        except Exception as e:
+            erros.append(e)
+        time.sleep(0.05)
+    thread.join()
+
+    assert not erros, f"leituras falharam durante a escrita: {erros[0]}"
+    assert leituras, "nenhuma leitura completou durante a escrita"
+    # Isolamento de snapshot: durante a transação só as linhas confirmadas.
+    assert set(leituras) <= {1000, 1000 + LINHAS_ESCRITA}
+    assert 1000 in leituras, "leituras ficaram bloqueadas até o commit da escrita"
+    with engine_leitura.connect() as conn:
+        assert (
+            conn.execute(text("SELECT COUNT(*) FROM historico_folha")).scalar()
+            == 1000 + LINHAS_ESCRITA
+        )
+    # Fecha os arquivos antes de o diretório temporário ser apagado.
+    engine.dispose()
+    engine_leitura.dispose()
+
+
+def _rodar_em_processo(diretorio):
+    ambiente = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(diretorio, 'concorrencia.db')}",
+    )
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--cenario"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=ambiente,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+
+@pytest.fixture
+def diretorio_banco(tmp_path):
+    # O banco de 200 mil linhas e as partições não ficam para trás.
+    yield tmp_path
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def test_leituras_durante_escrita_longa(diretorio_banco):
+    resultado = _rodar_em_processo(diretorio_banco)
+    assert resultado.returncode == 0, resultado.stdout + resultado.stderr
+
+
+if __name__ == "__main__":
+    if "--cenario" in sys.argv:
+        cenario_leituras_durante_escrita_longa()
+        sys.exit(0)
+    with tempfile.TemporaryDirectory() as diretorio:
+        resultado = _rodar_em_processo(diretorio)
+    if resultado.returncode != 0:
+        print(resultado.stdout + resultado.stderr)
+        sys.exit(1)
+    print("OK: leituras continuaram durante a escrita longa.")
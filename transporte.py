@@ -0,0 +1,97 @@
+import os
+import threading
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    # gzip/deflate sempre; br (e zstd) só quando o urllib3 consegue decodificar.
+    **urllib3.util.make_headers(accept_encoding=True),
+}
+MAX_WORKERS = int(os.getenv("INGESTOR_WORKERS", "10"))
+
+_lock = threading.Lock()
+_metricas = {"requisicoes": 0, "nao_modificadas": 0, "bytes_recebidos": 0}
+
+
+def _criar_sessao():
+    # Uma sessão compartilhada por todas as threads: o pool do urllib3 é
+    # thread-safe e, com pool_block=True, as threads esperam por uma conexão
+    # livre em vez de abrir (e descartar) conexões além do limite.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=MAX_WORKERS + 1,  # +1 para a lista mestra em streaming
+        pool_block=True,
+        max_retries=retry,
+    )
+    sessao = requests.Session()
+    sessao.headers.update(HEADERS)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    return sessao
+
+
+sessao = _criar_sessao()
+
+
+def get(url, validadores=None, **kwargs):
+    # validadores: {"etag": ..., "last_modified": ...} de uma resposta anterior.
+    # Se o recurso não mudou, o servidor responde 304 sem corpo.
+    headers = dict(kwargs.pop("headers", None) or {})
+    if validadores:
+        if validadores.get("etag"):
+            headers["If-None-Match"] = validadores["etag"]
+        if validadores.get("last_modified"):
+            headers["If-Modified-Since"] = validadores["last_modified"]
+    response = sessao.get(url, headers=headers, **kwargs)
+    with _lock:
+        _metricas["requisicoes"] += 1
+        if response.status_code == 304:
+            _metricas["nao_modificadas"] += 1
+        if not kwargs.get("stream"):
+            # tell() conta os bytes lidos do socket, ainda comprimidos.
+            _metricas["bytes_recebidos"] += response.raw.tell()
+    return response
+
+
+def validadores_da_resposta(response):
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def metricas():
+    conexoes = 0
+    requisicoes_pool = 0
+    pools = sessao.get_adapter("https://").poolmanager.pools
+    for chave in pools.keys():
+        pool = pools.get(chave)
+        if pool is None:
+            continue
+        conexoes += pool.num_connections
+        requisicoes_pool += pool.num_requests
+    with _lock:
+        dados = dict(_metricas)
+    dados["conexoes_abertas"] = conexoes
+    dados["conexoes_reutilizadas"] = max(requisicoes_pool - conexoes, 0)
+    return dados
+
+
+def resumo_metricas():
+    m = metricas()
+    print(
+        f"HTTP: {m['requisicoes']} requisições, {m['conexoes_abertas']} conexões "
+        f"abertas ({m['conexoes_reutilizadas']} reusos), "
+        f"{m['nao_modificadas']} respostas 304, "
+        f"{m['bytes_recebidos'] / 1e6:,.1f} MB transferidos (sem listas mestras)."
+    )